@@ -0,0 +1,31 @@
+import httpx
+from openai import AsyncOpenAI
+from config import config
+
+# Один клиент на процесс: все агенты и все прогоны eval переиспользуют
+# keep-alive соединения с OpenRouter вместо собственного пула на каждый экземпляр.
+_shared_client = None
+
+def get_shared_client() -> AsyncOpenAI:
+    """Возвращает общий AsyncOpenAI (создаётся при первом обращении)"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = AsyncOpenAI(
+            api_key=config.OPENROUTER_API_KEY,
+            base_url=config.OPENROUTER_BASE_URL,
+            # Повторы (429, сеть, таймауты, 5xx) делает BaseAgent поверх лимитера, встроенные отключаем
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=256, max_keepalive_connections=128),
+                http2=True,
+                timeout=config.REQUEST_TIMEOUT,
+            ),
+        )
+    return _shared_client
+
+async def close_shared_client():
+    """Закрывает общий клиент (вызывать при завершении работы)"""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.close()
+        _shared_client = None
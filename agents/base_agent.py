@@ -1,42 +1,212 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 from config import config
-import json
-import re
+from utils.jsonutil import loads
+from utils.ratelimit import estimate_tokens, get_limiter
+from ._client import get_shared_client
+from .cache import get_llm_cache, make_key
+import asyncio
+import io
+import random
+
+ANSWER_DELIM = "---ANSWER-DELIM---"
+
+# Ошибки, после которых запрос имеет смысл повторить: 429, обрыв соединения,
+# таймаут и 5xx. Встроенные повторы SDK отключены (см. _client.py), все
+# повторы идут здесь, через лимитер
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
 
 class BaseAgent:
-    def __init__(self, name: str, system_prompt: str):
+    def __init__(self, name: str, system_prompt: str, client: AsyncOpenAI = None):
         self.name = name
-        
-        # Новый клиент для OpenRouter
-        self.client = OpenAI(
-            api_key=config.OPENROUTER_API_KEY,
-            base_url=config.OPENROUTER_BASE_URL
-        )
-        
+
+        # Асинхронный клиент для OpenRouter: по умолчанию общий для всех агентов
+        self._client = client
+
         self.system_prompt = system_prompt
-    
-    def call_llm(self, prompt: str, temperature: float = None) -> str:
-        """Вызов LLM через OpenRouter"""
+
+        # Всё, что не меняется между вызовами, считаем один раз: готовое
+        # system-сообщение, его оценку в токенах для лимитера и подпись
+        # (модель + system prompt) для ключа кэша ответов
+        self._system_tokens = estimate_tokens(system_prompt)
+        self._system_message = {"role": "system", "content": system_prompt}
+        if (config.MODEL.startswith(config.CACHE_CONTROL_MODEL_PREFIXES)
+                and self._system_tokens >= config.CACHE_CONTROL_MIN_TOKENS):
+            # Явная точка кэширования промпта (Anthropic/Gemini через OpenRouter):
+            # неизменный system переиспользуется провайдером между вызовами
+            self._system_message = {"role": "system", "content": [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ]}
+        self._prompt_sig = make_key("system", {"m": config.MODEL, "s": system_prompt}).hex()
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Общий клиент берётся при первом вызове LLM: агента можно создать
+        # и без ключа OpenRouter (например, только для сборки промптов)
+        return self._client or get_shared_client()
+
+    def build_messages(self, prompt: str) -> list:
+        """Сообщения chat.completions для данного промпта"""
+        return [self._system_message, {"role": "user", "content": prompt}]
+
+    async def call_llm(self, prompt: str, temperature: float = None, stream_to=None) -> str:
+        """Вызов LLM через OpenRouter.
+
+        Если передан stream_to (открытый текстовый файл), ответ запрашивается
+        потоково и пишется в него по мере поступления; возвращается полный текст.
+        Ошибка в потоковом режиме пробрасывается: в stream_to уже может быть
+        часть ответа, и выдавать её за готовый ответ нельзя.
+        """
+        if temperature is None:
+            temperature = config.TEMPERATURE
+
+        # Кэшируем только почти детерминированные вызовы (temperature <= LLM_CACHE_MAX_TEMPERATURE,
+        # например валидатор); остальные — лишь если кэш включён явно (FORCE_LLM_CACHE, --force_cache в eval)
+        cache = None
+        if temperature <= config.LLM_CACHE_MAX_TEMPERATURE or config.FORCE_LLM_CACHE:
+            cache = get_llm_cache()
+            key = make_key("call_llm", {
+                "sig": self._prompt_sig,
+                "u": prompt,
+                "temp": temperature,
+                "max_tokens": config.MAX_TOKENS,
+            })
+            cached = await cache.aget(key)
+            if cached is not None:
+                if stream_to is not None:
+                    stream_to.write(cached)
+                return cached
+
         try:
-            response = self.client.chat.completions.create(
-                model=config.MODEL,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature or config.TEMPERATURE,
-                max_tokens=config.MAX_TOKENS,
-            )
-            return response.choices[0].message.content
+            if stream_to is None:
+                response = await self._create_completion(self.build_messages(prompt), temperature)
+                content = response.choices[0].message.content
+            else:
+                content = await self._stream_completion(self.build_messages(prompt), temperature, stream_to)
         except Exception as e:
+            if stream_to is not None:
+                raise
             return f"Ошибка при обращении к OpenRouter API: {e}"
-    
-    def extract_json(self, text: str) -> dict:
-        """Извлекает JSON из текста ответа (без изменений)"""
+
+        if cache is not None and content:
+            await cache.aput(key, content, ttl=config.LLM_CACHE_TTL)
+        return content
+
+    async def call_llm_batched(self, prompts: list, temperature: float = None):
+        """Несколько независимых промптов одним запросом (экономия RPM и system-токенов).
+
+        Задачи упаковываются в [TASK i]...[/TASK i], ответы модель разделяет
+        строкой ANSWER_DELIM. Возвращает список ответов в порядке prompts или
+        None, если ответ не удалось разобрать (вызывающий откатывается на
+        поштучные вызовы).
+        """
+        if temperature is None:
+            temperature = config.TEMPERATURE
+
+        tasks = "\n\n".join(f"[TASK {i}]\n{p}\n[/TASK {i}]" for i, p in enumerate(prompts, 1))
+        prompt = (
+            f"Ниже {len(prompts)} независимых задач. Выполни каждую отдельно и полностью. "
+            f"Верни ответы строго в порядке задач, разделяя их отдельной строкой {ANSWER_DELIM}. "
+            f"Не добавляй номера задач и ничего кроме ответов.\n\n{tasks}"
+        )
         try:
-            json_match = re.search(r'\{.*\}', text, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
+            response = await self._create_completion(
+                self.build_messages(prompt), temperature,
+                max_tokens=config.MAX_TOKENS * len(prompts),
+            )
+            content = response.choices[0].message.content or ""
+        except Exception:
+            return None
+
+        answers = [a.strip() for a in content.split(ANSWER_DELIM)]
+        if answers and not answers[-1]:
+            answers.pop()
+        if len(answers) != len(prompts) or not all(answers):
+            return None
+        return answers
+
+    async def _stream_completion(self, messages: list, temperature: float, out) -> str:
+        """Потоковый ответ: чанки сразу пишутся в out и собираются в строку"""
+        buf = io.StringIO()
+        stream = await self._create_completion(messages, temperature, stream=True)
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            out.write(delta)
+            buf.write(delta)
+        return buf.getvalue()
+
+    async def _create_completion(self, messages: list, temperature: float, stream: bool = False, max_tokens: int = None):
+        """chat.completions.create с проактивным ограничением RPM/TPM.
+
+        Перед запросом резервируем ёмкость в общем лимитере (промпт + max_tokens),
+        поэтому 429 остаётся только на редкие всплески. На 429, сетевые ошибки,
+        таймауты и 5xx одна политика повторов со случайной экспоненциальной задержкой.
+        """
+        max_tokens = max_tokens or config.MAX_TOKENS
+        limiter = get_limiter()
+        # messages собраны build_messages: первым идёт неизменный system
+        tokens = self._system_tokens + sum(estimate_tokens(m["content"]) for m in messages[1:]) + max_tokens
+        for attempt in range(config.RATE_LIMIT_RETRIES + 1):
+            await limiter.acquire(req=1, tok=tokens)
+            try:
+                return await self.client.chat.completions.create(
+                    model=config.MODEL,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=stream,
+                )
+            except RETRYABLE_ERRORS:
+                if attempt == config.RATE_LIMIT_RETRIES:
+                    raise
+                await asyncio.sleep(random.uniform(1, min(30, 2 ** (attempt + 1))))
+
+    def extract_json(self, text: str) -> dict:
+        """Извлекает первый JSON-объект из текста ответа.
+
+        Линейный проход со счётчиком скобок (учитывает строки и экранирование)
+        вместо жадного regex: нет бэктрекинга на длинном тексте и «хвоста»
+        до последней } в ответе.
+        """
+        if not isinstance(text, str):
             return {"raw_response": text}
-        except:
-            return {"raw_response": text}
\ No newline at end of file
+        # Частый случай — ответ целиком и есть JSON: один вызов парсера без посимвольного прохода
+        stripped = text.strip()
+        if stripped.startswith("{") and stripped.endswith("}"):
+            try:
+                return loads(stripped)
+            except ValueError:
+                pass
+        start = text.find("{")
+        while start >= 0:
+            depth = 0
+            in_str = False
+            esc = False
+            end = -1
+            for j in range(start, len(text)):
+                c = text[j]
+                if in_str:
+                    if esc:
+                        esc = False
+                    elif c == "\\":
+                        esc = True
+                    elif c == '"':
+                        in_str = False
+                elif c == '"':
+                    in_str = True
+                elif c == "{":
+                    depth += 1
+                elif c == "}":
+                    depth -= 1
+                    if depth == 0:
+                        end = j
+                        break
+            if end < 0:
+                break
+            try:
+                return loads(text[start:end + 1])
+            except ValueError:
+                # Не JSON (например, фигурные скобки в прозе) — ищем следующий объект
+                start = text.find("{", end + 1)
+        return {"raw_response": text}
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from config import config
+from utils.jsonutil import dumps, loads
+
+_MISSING = object()
+
+
+def make_key(name: str, args: dict) -> bytes:
+    """Ключ кэша: хэш от имени операции и канонического JSON аргументов.
+
+    16 сырых байт BLAKE2b (а не hex): в SQLite ключ хранится как BLOB вдвое короче.
+    """
+    payload = f"{name}|{dumps(args, sort_keys=True)}"
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+class ToolCache:
+    """Двухуровневый кэш: LRU в памяти процесса + SQLite-файл на диске.
+
+    Дисковый уровень общий для всех процессов (бот, eval, dev-режим),
+    поэтому повторные одинаковые вызовы не идут в сеть даже после перезапуска.
+    Из async-кода вызывать aget/aput: попадание в LRU отдаётся сразу,
+    обращения к SQLite (с commit) уходят в поток и не блокируют event loop.
+    """
+
+    def __init__(self, path: str, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        # Память и SQLite под разными локами: попадание в LRU не ждёт,
+        # пока другой поток пишет на диск
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # WAL + synchronous=NORMAL: каждый put не ждёт fsync, читатели из других
+        # процессов (бот, eval) не блокируются писателем
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA temp_store=MEMORY")
+        self._db.execute("PRAGMA mmap_size=268435456")
+        self._db.execute("PRAGMA cache_size=-65536")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        # WITHOUT ROWID: ключ и есть B-дерево таблицы, без отдельного
+        # автоиндекса поверх rowid
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key BLOB PRIMARY KEY, value TEXT NOT NULL, expires_at REAL) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        value = self._memory_get(key)
+        if value is not _MISSING:
+            return value
+        return self._load(key)
+
+    def put(self, key: bytes, value: Any, ttl: float = None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._remember(key, value, expires_at)
+        self._store(key, value, expires_at)
+
+    async def aget(self, key: bytes) -> Optional[Any]:
+        """get для async-кода: SQLite читается в отдельном потоке"""
+        value = self._memory_get(key)
+        if value is not _MISSING:
+            return value
+        return await asyncio.to_thread(self._load, key)
+
+    async def aput(self, key: bytes, value: Any, ttl: float = None):
+        """put для async-кода: в память сразу, запись в SQLite в отдельном потоке"""
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._remember(key, value, expires_at)
+        await asyncio.to_thread(self._store, key, value, expires_at)
+
+    def _memory_get(self, key: bytes) -> Any:
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return _MISSING
+            value, expires_at = item
+            if expires_at is None or expires_at > time.time():
+                self._memory.move_to_end(key)
+                return value
+            del self._memory[key]
+            return _MISSING
+
+    def _load(self, key: bytes) -> Optional[Any]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = loads(row[0]), row[1]
+            if expires_at is not None and expires_at <= time.time():
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+        with self._lock:
+            self._remember(key, value, expires_at)
+        return value
+
+    def _store(self, key: bytes, value: Any, expires_at: Optional[float]):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, dumps(value), expires_at),
+            )
+            self._db.commit()
+
+    def _remember(self, key: bytes, value: Any, expires_at: Optional[float]):
+        # вызывается под self._lock
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+
+_tool_cache = None
+
+def get_tool_cache() -> ToolCache:
+    """Общий кэш результатов инструментов (загрузка страниц и т.п.)"""
+    global _tool_cache
+    if _tool_cache is None:
+        _tool_cache = ToolCache(os.path.join(config.CACHE_DIR, "tools.sqlite"))
+    return _tool_cache
+
+
+_llm_cache = None
+
+def get_llm_cache() -> ToolCache:
+    """Общий кэш ответов LLM"""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = ToolCache(os.path.join(config.CACHE_DIR, "llm.sqlite"))
+    return _llm_cache
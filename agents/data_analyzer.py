@@ -1,9 +1,11 @@
 from .base_agent import BaseAgent
 from config import config
 from database.json_db import JSONDatabase
-import json
+from utils.jsonutil import dumps
 
 class DataAnalyzerAgent(BaseAgent):
+    TEMPERATURE = 0.5
+
     def __init__(self, db: JSONDatabase):
         super().__init__(
             name="Data Analyzer", 
@@ -11,21 +13,35 @@ class DataAnalyzerAgent(BaseAgent):
         )
         self.db = db
     
-    def generate_advice(self, user_data: dict) -> str:
-        """Генерирует советы на основе данных пользователя и БД"""
+    async def generate_advice(self, user_data: dict, stream_to=None) -> str:
+        """Генерирует советы на основе данных пользователя и БД.
+
+        stream_to — открытый файл, в который ответ пишется по мере генерации.
+        """
+        prompt = self.build_prompt(user_data)
+        return await self.call_llm(prompt, temperature=self.TEMPERATURE, stream_to=stream_to)
+
+    async def generate_advice_batch(self, users: list):
+        """Советы для нескольких пользователей одним запросом; None — если ответ не разобран"""
+        prompts = [self.build_prompt(user_data) for user_data in users]
+        return await self.call_llm_batched(prompts, temperature=self.TEMPERATURE)
+
+    def build_prompt(self, user_data: dict) -> str:
+        """Собирает промпт для генерации советов"""
         
-        # Ищем релевантные тренды в БД
-        trends = self.db.search_trends(
+        # Ищем релевантные тренды в БД (сразу в виде JSON: для тех же отрасли
+        # и города строка берётся из кэша БД без повторной сериализации)
+        trends = self.db.search_trends_json(
             industry=user_data.get('industry', ''),
             city=user_data.get('city', '')
         )
         
         prompt = f"""
         ДАННЫЕ ПОЛЬЗОВАТЕЛЯ:
-        {json.dumps(user_data, ensure_ascii=False, indent=2)}
+        {dumps(user_data, indent=True)}
         
         РЕЛЕВАНТНЫЕ ТРЕНДЫ ИЗ БАЗЫ ДАННЫХ:
-        {json.dumps(trends, ensure_ascii=False, indent=2)}
+        {trends}
         
         Сгенерируй подробные практические советы используя Chain of Thought.
         Структура ответа:
@@ -49,4 +65,4 @@ class DataAnalyzerAgent(BaseAgent):
         [Стратегия продвижения]
         """
         
-        return self.call_llm(prompt, temperature=0.5)
\ No newline at end of file
+        return prompt
\ No newline at end of file
@@ -1,6 +1,6 @@
 from .base_agent import BaseAgent
 from config import config
-import json
+from collections import deque
 
 class DataCollectorAgent(BaseAgent):
     def __init__(self):
@@ -8,22 +8,24 @@ class DataCollectorAgent(BaseAgent):
             name="Data Collector",
             system_prompt=config.PROMPTS["data_collector"]
         )
-        self.conversation_history = []
+        # В промпт идут только последние 6 реплик — старше не храним
+        self.conversation_history = deque(maxlen=6)
     
     def start_conversation(self) -> str:
         """Начинает диалог с пользователем"""
         return "Привет! Я помогу тебе с бизнес-идеей. Расскажи, какую сферу деятельности ты рассматриваешь?"
     
-    def process_user_input(self, user_input: str) -> tuple:
+    async def process_user_input(self, user_input: str) -> tuple:
         """
         Обрабатывает ввод пользователя
         Возвращает (следующий_вопрос, собранные_данные или None)
         """
         self.conversation_history.append(f"Пользователь: {user_input}")
+        history = '\n'.join(self.conversation_history)
         
         prompt = f"""
         История диалога:
-        {'\n'.join(self.conversation_history[-6:])}  # Последние 6 сообщений
+        {history}  # Последние 6 сообщений
         
         На основе этого диалога:
         1. Определи, какая информация уже собрана
@@ -43,7 +45,7 @@ class DataCollectorAgent(BaseAgent):
         }}
         """
         
-        response = self.call_llm(prompt, temperature=0.3)
+        response = await self.call_llm(prompt, temperature=0.3)
         self.conversation_history.append(f"Ассистент: {response}")
         
         # Пытаемся извлечь JSON (значит данные собраны)
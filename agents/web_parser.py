@@ -1,49 +1,143 @@
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+from bs4 import BeautifulSoup, UnicodeDammit
 from .base_agent import BaseAgent
+from .cache import get_tool_cache, make_key
 from config import config
-import json
+import asyncio
+
+# lxml — C-парсер, в разы быстрее встроенного html.parser
+try:
+    import lxml.html
+    from lxml import etree
+    HTML_PARSER = 'lxml'
+except ImportError:
+    lxml = None
+    HTML_PARSER = 'html.parser'
+
+# Как и soup.get_text(), текст этих тегов в результат не попадает
+SKIP_TAGS = ('script', 'style', 'template')
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+def _page_strings(content: bytes, encoding: str = None):
+    """Текстовые узлы страницы в порядке документа.
+
+    С lxml дерево строится и обходится в C, без объектов BeautifulSoup;
+    кодировка определяется так же, как в BeautifulSoup (UnicodeDammit).
+    encoding — charset из заголовка ответа: пробуется первым, без угадывания.
+    """
+    if lxml is not None:
+        markup = UnicodeDammit(content, [encoding] if encoding else [], is_html=True).unicode_markup
+        try:
+            root = lxml.html.document_fromstring(markup)
+        except (etree.ParserError, ValueError, TypeError):
+            root = None
+        if root is not None:
+            etree.strip_elements(root, *SKIP_TAGS, with_tail=False)
+            return root.itertext()
+    return BeautifulSoup(content, HTML_PARSER, from_encoding=encoding).strings
+
+def page_text(content: bytes, limit: int, encoding: str = None) -> str:
+    """Первые limit символов текста страницы (как soup.get_text()[:limit]) без
+    сборки всего текста: обход дерева останавливается, как только набрано достаточно"""
+    parts = []
+    size = 0
+    for s in _page_strings(content, encoding):
+        parts.append(s)
+        size += len(s)
+        if size >= limit:
+            break
+    return "".join(parts)[:limit]
 
 class WebParserAgent(BaseAgent):
+    FETCH_CONCURRENCY = 10  # Одновременных загрузок страниц
+    TEXT_LIMIT = 8000  # Символов текста страницы в промпте
+    MAX_PAGE_BYTES = 2_000_000  # Сколько байт ответа читаем максимум
+    HTML_TYPES = ('text/html', 'application/xhtml+xml')
+
     def __init__(self):
         super().__init__(
             name="Web Parser",
             system_prompt=config.PROMPTS["web_parser"]
         )
+        self._fetch_sem = asyncio.Semaphore(self.FETCH_CONCURRENCY)
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Одна сессия на агента: keep-alive соединения и DNS-кэш переживают
+        # отдельные загрузки, TLS-рукопожатие на каждую страницу не повторяется
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=HEADERS,
+                timeout=aiohttp.ClientTimeout(total=10),
+                connector=aiohttp.TCPConnector(limit=self.FETCH_CONCURRENCY * 2, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def close(self):
+        """Закрывает HTTP-сессию (вызывать при завершении работы)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
     
-    def parse_website(self, url: str) -> dict:
+    async def parse_websites(self, urls: list) -> list:
+        """Парсит несколько сайтов конкурентно, сохраняя порядок urls"""
+        return await asyncio.gather(*(self.parse_website(url) for url in urls))
+
+    async def fetch_page_text(self, url: str) -> str:
+        """Загружает страницу и возвращает её текст (с кэшированием по url)"""
+        cache = get_tool_cache()
+        key = make_key("fetch_page_text", {"url": url})
+        text = await cache.aget(key)
+        if text is not None:
+            return text
+
+        # aiohttp: загрузки разных страниц перекрываются в одном event loop
+        async with self._fetch_sem:
+            async with self._get_session().get(url) as response:
+                ok = response.status < 400
+                encoding = response.charset
+                # PDF, картинки, фиды и т.п. не скачиваем и не парсим;
+                # без Content-Type aiohttp отдаёт application/octet-stream
+                content_type = response.headers.get('Content-Type', '')
+                if content_type and response.content_type not in self.HTML_TYPES:
+                    if ok:
+                        await cache.aput(key, "", ttl=config.PAGE_CACHE_TTL)
+                    return ""
+                # Тело читаем потоково и не больше MAX_PAGE_BYTES
+                chunks = []
+                size = 0
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= self.MAX_PAGE_BYTES:
+                        break
+                content = b"".join(chunks)[:self.MAX_PAGE_BYTES]
+
+        # Извлекаем основной текст
+        text = page_text(content, self.TEXT_LIMIT, encoding)  # Ограничиваем длину
+        if ok:  # страницы с ошибками не кэшируем
+            await cache.aput(key, text, ttl=config.PAGE_CACHE_TTL)
+        return text
+
+    async def parse_website(self, url: str) -> dict:
         """Парсит сайт и извлекает структурированную информацию"""
         
         try:
             # Загружаем страницу
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Извлекаем основной текст
-            text = soup.get_text()[:8000]  # Ограничиваем длину
+            text = await self.fetch_page_text(url)
+            if not text.strip():
+                # Нечего анализировать (не HTML или пустая страница) — без вызова LLM
+                return {"error": f"Нет текста на странице {url}"}
             
             prompt = f"""
             Содержимое веб-страницы с {url}:
             
             {text}
-            
-            Проанализируй и извлеки информацию о бизнес-трендах, возможностях для стартапов, 
-            перспективных нишах. Верни JSON со структурой:
-            {{
-                "trends": ["тренд1", "тренд2"],
-                "opportunities": ["возможность1", "возможность2"], 
-                "statistics": {{"статистика1": "значение"}},
-                "advice": ["совет1", "совет2"],
-                "sources": ["источник1"],
-                "industry": "IT/Общепит/Retail/Услуги",
-                "confidence": 0.8
-            }}
             """
             
-            result = self.call_llm(prompt, temperature=0.2)
+            result = await self.call_llm(prompt, temperature=0.2)
             return self.extract_json(result)
             
         except Exception as e:
@@ -34,6 +34,8 @@ class InteractiveBusinessBot:
                     logger.info(f"Data saved: {data}")
                 def search_trends(self, *args): 
                     return []
+                def search_trends_json(self, *args, **kwargs):
+                    return "[]"
             return DummyDB()
 
     def _init_agents(self):
@@ -91,7 +93,7 @@ class InteractiveBusinessBot:
         collector = session['collector']
 
         try:
-            next_question, collected_data = collector.process_user_input(user_input)
+            next_question, collected_data = await collector.process_user_input(user_input)
 
             if collected_data:
                 session['collected_data'] = collected_data
@@ -127,7 +129,7 @@ class InteractiveBusinessBot:
 
             await update.message.reply_chat_action(action="typing")
 
-            advice = analyzer.generate_advice(user_data)
+            advice = await analyzer.generate_advice(user_data)
 
             response_text = f"""
 🎯 *РЕКОМЕНДАЦИИ ДЛЯ ВАШЕГО БИЗНЕСА*
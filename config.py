@@ -23,10 +23,28 @@ class Config:
     
     TEMPERATURE: float = 0.7
     MAX_TOKENS: int = 2000
+    REQUEST_TIMEOUT: float = 120.0  # Таймаут HTTP-запроса к OpenRouter, сек
+    # Кэш ответов LLM: по умолчанию только для вызовов с temperature <= порога
+    LLM_CACHE_MAX_TEMPERATURE: float = 0.1
+    LLM_CACHE_TTL: float = 24 * 3600  # сек
+    # Кэшировать ответы LLM при любой температуре (удобно для повторных прогонов eval)
+    FORCE_LLM_CACHE: bool = os.getenv("FORCE_LLM_CACHE", "0") == "1"
+
+    # Prompt caching: для этих провайдеров длинный system prompt помечается cache_control.
+    # DeepSeek/OpenAI кэшируют общий префикс автоматически, им разметка не нужна.
+    CACHE_CONTROL_MODEL_PREFIXES: tuple = ("anthropic/", "google/")
+    CACHE_CONTROL_MIN_TOKENS: int = 1024  # короче провайдер не кэширует
+
+    # Лимиты аккаунта OpenRouter: запросы и токены в минуту
+    RATE_LIMIT_RPM: int = int(os.getenv("RATE_LIMIT_RPM", "60"))
+    RATE_LIMIT_TPM: int = int(os.getenv("RATE_LIMIT_TPM", "200000"))
+    RATE_LIMIT_RETRIES: int = 3  # Повторы на 429, сетевые ошибки, таймауты и 5xx
     
     # Пути к данным
     DB_PATH: str = "data/database.json"
     PARSED_DATA_PATH: str = "data/parsed_data/"
+    CACHE_DIR: str = "data/cache/"
+    PAGE_CACHE_TTL: float = 24 * 3600  # Сколько живёт текст загруженной страницы, сек
 
 
     # Промпты для агентов
@@ -54,17 +72,38 @@ class Config:
 
 Будь конкретным и практичным. Ответ структурируй по разделам.""",
         
-        "web_parser": """Ты - аналитик данных. Проанализируй содержимое веб-страницы и извлеки информацию о бизнес-трендах, нишах и возможностях.
-Извлеки: тренды, перспективные ниши, статистику, советы для стартапов, региональные особенности, конкурентные компании и возможные спонсоры.""",
+        # Промпты web_parser и validator содержат и формат ответа: они целиком идут
+        # в system, неизменный префикс запроса кэшируется провайдером между вызовами
+        "web_parser": """Ты - аналитик данных. Проанализируй содержимое веб-страницы и извлеки информацию о бизнес-трендах, возможностях для стартапов, перспективных нишах.
+Учитывай статистику, региональные особенности, конкурентные компании и возможных спонсоров.
+
+Верни JSON со структурой:
+{
+    "trends": ["тренд1", "тренд2"],
+    "opportunities": ["возможность1", "возможность2"],
+    "statistics": {"статистика1": "значение"},
+    "advice": ["совет1", "совет2"],
+    "sources": ["источник1"],
+    "industry": "IT/Общепит/Retail/Услуги",
+    "confidence": 0.8
+}""",
         
         "validator": """Ты - валидатор данных. Проверь, соответствует ли информация критериям:
-1. Актуальность (не старше 2 лет)
-2. Достоверность (есть ли источники)
-3. Релевантность бизнес-тематике
-4. Конкретность (есть цифры, факты)
-5. Практическая применимость
+1. Актуальность
+2. Релевантность бизнес-тематике
+3. Конкретность (есть цифры, факты, а не общие слова)
+4. Практическая применимость
+
+!!!Пока проект находится на стадии тестирования будь подобрее и пусть не проходят проверку только крайне неподхдящая информация
 
-Верни JSON: {"is_valid": bool, "issues": list, "confidence_score": float}"""
+Верни JSON:
+{
+    "is_valid": true/false,
+    "issues": ["проблема1", "проблема2"],
+    "confidence_score": 0.95,
+    "suggestions": ["предложение1"],
+    "validated_fields": ["поле1", "поле2"]
+}"""
     }
 
 config = Config()
\ No newline at end of file
@@ -1,4 +1,5 @@
-import json
+from utils.jsonutil import dumps, loads
+import copy
 import os
 from typing import Dict, List, Any
 from datetime import datetime
@@ -6,6 +7,15 @@ from datetime import datetime
 class JSONDatabase:
     def __init__(self, db_path: str):
         self.db_path = db_path
+        # Содержимое файла держим в памяти и перечитываем только если файл
+        # изменился на диске (например, его обновил другой процесс)
+        self._data = None
+        self._mtime = None
+        self._industry_index = None
+        self._search_cache = {}
+        self._search_json_cache = {}
+        self._trend_keys = None
+        self._source_urls = None
         self._ensure_db_exists()
     
     def _ensure_db_exists(self):
@@ -23,34 +33,142 @@ class JSONDatabase:
             self._save_data(initial_data)
     
     def _load_data(self) -> Dict:
-        with open(self.db_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        mtime = os.stat(self.db_path).st_mtime_ns
+        if self._data is None or mtime != self._mtime:
+            with open(self.db_path, 'rb') as f:
+                self._data = loads(f.read())
+            self._mtime = mtime
+            self._industry_index = None
+            self._trend_keys = None
+            self._source_urls = None
+        return self._data
     
     def _save_data(self, data: Dict):
         data['updated_at'] = datetime.now().isoformat()
+        # json.dump пишет в файл множеством мелких write — сериализуем целиком и пишем разом
+        payload = dumps(data, indent=True)
         with open(self.db_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.write(payload)
+        self._data = data
+        self._mtime = os.stat(self.db_path).st_mtime_ns
+        self._industry_index = None
+    
+    def _get_industry_index(self, data: Dict) -> Dict[str, List]:
+        """Индекс трендов: отрасль в нижнем регистре -> [(позиция, тренд)].
+
+        Отраслей единицы, трендов — сотни: подстроку ищем по ключам индекса,
+        а не по всем записям. Сбрасывается при любой перезагрузке/записи.
+        """
+        if self._industry_index is None:
+            index = {}
+            for pos, trend in enumerate(data['business_trends']):
+                industry = trend.get('industry')
+                key = industry.lower() if isinstance(industry, str) else ''
+                index.setdefault(key, []).append((pos, trend))
+            self._industry_index = index
+            # результаты поиска действительны, пока жив индекс
+            self._search_cache = {}
+            self._search_json_cache = {}
+        return self._industry_index
     
     def add_business_trend(self, trend_data: Dict):
+        self.add_business_trends([trend_data])
+    
+    @staticmethod
+    def _key_part(value) -> str:
+        # LLM может вернуть null или объект вместо строки — такие тренды
+        # сохраняются как есть, ключ для них строим из канонического JSON
+        if value is None:
+            return ''
+        if not isinstance(value, str):
+            value = dumps(value, sort_keys=True)
+        return value.strip().lower()
+    
+    @classmethod
+    def _trend_key(cls, trend_data: Dict) -> tuple:
+        return (cls._key_part(trend_data.get('industry')), cls._key_part(trend_data.get('trend')))
+    
+    def _get_trend_keys(self, data: Dict) -> set:
+        """Множество (отрасль, тренд) уже сохранённых трендов для дедупликации"""
+        if self._trend_keys is None:
+            self._trend_keys = {self._trend_key(t) for t in data['business_trends']}
+        return self._trend_keys
+    
+    def has_trend(self, trend_data: Dict) -> bool:
+        return self._trend_key(trend_data) in self._get_trend_keys(self._load_data())
+    
+    def _get_source_urls(self, data: Dict) -> set:
+        """Множество URL, из которых уже извлечены сохранённые тренды"""
+        if self._source_urls is None:
+            self._source_urls = {url for t in data['business_trends'] for url in t.get('sources') or [] if isinstance(url, str)}
+        return self._source_urls
+    
+    def has_source(self, url: str) -> bool:
+        return url in self._get_source_urls(self._load_data())
+    
+    def add_business_trends(self, trends: List[Dict]):
+        """Добавляет пачку трендов с одной перезаписью файла.
+
+        Сохраняются все переданные тренды; дубликаты отсекает вызывающий через
+        has_trend/has_source — множества ключей и URL обновляются здесь же.
+        """
+        if not trends:
+            return
         data = self._load_data()
-        trend_data['id'] = len(data['business_trends']) + 1
-        trend_data['created_at'] = datetime.now().isoformat()
-        data['business_trends'].append(trend_data)
+        keys = self._get_trend_keys(data)
+        urls = self._get_source_urls(data)
+        created_at = datetime.now().isoformat()
+        for trend_data in trends:
+            keys.add(self._trend_key(trend_data))
+            urls.update(url for url in trend_data.get('sources') or [] if isinstance(url, str))
+            trend_data['id'] = len(data['business_trends']) + 1
+            trend_data['created_at'] = created_at
+            data['business_trends'].append(trend_data)
         self._save_data(data)
     
     def search_trends(self, industry: str, city: str = None) -> List[Dict]:
         data = self._load_data()
-        results = []
+        industry = industry.lower()
+        city = city.lower() if city else city
+        
+        # Одни и те же (отрасль, город) запрашиваются многократно (повторы в eval,
+        # пользователи одной сферы) — между записями в БД ответ не меняется
+        index = self._get_industry_index(data)
+        cached = self._search_cache.get((industry, city))
+        if cached is not None:
+            return copy.deepcopy(cached)
         
-        for trend in data['business_trends']:
-            if industry.lower() in trend.get('industry', '').lower():
-                if city and trend.get('city'):
-                    if city.lower() in trend.get('city', '').lower():
-                        results.append(trend)
-                else:
+        matched = []
+        for key, items in index.items():
+            if industry in key:
+                matched.extend(items)
+        if len(matched) > 1:
+            matched.sort(key=lambda item: item[0])  # исходный порядок записей
+        
+        results = []
+        for _, trend in matched:
+            if city and isinstance(trend.get('city'), str) and trend['city']:
+                if city in trend['city'].lower():
                     results.append(trend)
+            else:
+                results.append(trend)
         
-        return results
+        self._search_cache[(industry, city)] = results
+        # Записи живут в кэше БД в памяти — наружу отдаём глубокие копии (вместе
+        # с вложенными списками sources и т.п.), чтобы изменения у вызывающего
+        # не попадали в кэш и в следующую запись файла
+        return copy.deepcopy(results)
+    
+    def search_trends_json(self, industry: str, city: str = None) -> str:
+        """search_trends, уже сериализованный в JSON для промпта (кэшируется так же)"""
+        data = self._load_data()
+        self._get_industry_index(data)
+        key = (industry.lower(), city.lower() if city else city)
+        text = self._search_json_cache.get(key)
+        if text is None:
+            text = dumps(self.search_trends(industry, city), indent=True)
+            self._search_json_cache[key] = text
+        return text
     
     def add_parsed_source(self, source_data: Dict):
         data = self._load_data()
@@ -11,12 +11,29 @@
 
 Также объединяет human_scores_template.csv (если заполнен) и считает средние баллы.
 """
-import os, json, argparse, statistics, re, csv, math
+import sys
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+import json, argparse, statistics, re, csv, math, functools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# JSONL читается через orjson (C-парсер), если он установлен
+from utils.jsonutil import loads
+
 URL_RE = re.compile(r"https?://\S+")
+
+@functools.lru_cache(maxsize=None)
+def section_pattern(s):
+    # одинаковые секции у разных кейсов компилируются один раз
+    # permissive: header can be "Идея:" or "## Идея" etc.
+    return re.compile(rf"(^|\n)\s*(#+\s*)?{re.escape(s)}\b", flags=re.IGNORECASE)
+
 def percentile(xs, p):
-    xs=sorted(xs)
+    """xs должен быть уже отсортирован: сортируем один раз на все перцентили"""
     if not xs: return None
     k=(len(xs)-1)*p
     f=math.floor(k); c=math.ceil(k)
@@ -30,6 +47,7 @@ def main():
     ap.add_argument("--cases", default="eval/testcases.jsonl")
     ap.add_argument("--human", default="eval/human_scores_template.csv")
     ap.add_argument("--out", default="eval_outputs/metrics.json")
+    ap.add_argument("--workers", type=int, default=32, help="Потоки для чтения файлов ответов")
     args=ap.parse_args()
 
     # load cases to get must_sections
@@ -37,44 +55,58 @@ def main():
     with open(args.cases,"r",encoding="utf-8") as f:
         for line in f:
             if line.strip():
-                c=json.loads(line)
+                c=loads(line)
                 cases[c["id"]]=c
 
-    runs=[]
-    with open(args.index,"r",encoding="utf-8") as f:
-        for line in f:
-            if line.strip():
-                runs.append(json.loads(line))
-
-    lat=[r.get("latency_sec") for r in runs if isinstance(r.get("latency_sec"), (int,float))]
-    ok=[r for r in runs if r.get("status",{}).get("ok")]
+    # Паттерны секций компилируются один раз на кейс, а не на каждый прогон.
+    # Одна общая альтернация не подходит: секции-префиксы ("План" / "План действий")
+    # в ней «съедают» совпадения друг друга, и покрытие считалось бы иначе.
+    section_res={cid: [section_pattern(s) for s in c.get("must_sections",[])] for cid, c in cases.items()}
 
     # sections and sources from final answer text
-    sec_hits=[]
-    src_hits=[]
-    for r in runs:
-        run_path=os.path.join(args.raw_dir, f"{r['id']}_run{r['run']}")
+    def process_run(run_id, run):
+        run_path=os.path.join(args.raw_dir, f"{run_id}_run{run}")
         ans_path=os.path.join(run_path,"05_final_answer.txt")
         text=""
         if os.path.exists(ans_path):
-            text=open(ans_path,"r",encoding="utf-8",errors="ignore").read()
+            with open(ans_path,"r",encoding="utf-8",errors="ignore") as f:
+                text=f.read()
 
-        must=cases.get(r["id"],{}).get("must_sections",[])
-        found=0
-        for s in must:
-            # permissive: header can be "Идея:" or "## Идея" etc.
-            if re.search(rf"(^|\n)\s*(#+\s*)?{re.escape(s)}\b", text, flags=re.IGNORECASE):
-                found+=1
-        sec_hits.append(found/len(must) if must else 0.0)
+        pats=section_res.get(run_id,[])
+        found=sum(1 for rx in pats if rx.search(text))
+        # нужен только счётчик — список совпадений не строим
+        return (found/len(pats) if pats else 0.0), sum(1 for _ in URL_RE.finditer(text))
 
-        urls=URL_RE.findall(text)
-        src_hits.append(len(urls))
+    # Один потоковый проход по индексу: записи прогонов не держим в памяти,
+    # копим только счётчики и числовые ряды. Файлы ответов читаются в пуле
+    # потоков (перекрываем ожидание диска), агрегация — в главном потоке.
+    n_runs=0
+    n_ok=0
+    max_run=0
+    lat=[]
+    futures=[]
+    with ThreadPoolExecutor(max_workers=args.workers) as tpe, open(args.index,"r",encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            r=loads(line)
+            n_runs+=1
+            max_run=max(max_run, r.get("run",1))
+            if r.get("status",{}).get("ok"):
+                n_ok+=1
+            if isinstance(r.get("latency_sec"), (int,float)):
+                lat.append(r["latency_sec"])
+            futures.append(tpe.submit(process_run, r["id"], r["run"]))
+        results=[fut.result() for fut in futures]
+    lat.sort()
+    sec_hits=[x[0] for x in results]
+    src_hits=[x[1] for x in results]
 
     metrics = {
-        "n_runs": len(runs),
+        "n_runs": n_runs,
         "n_cases": len(cases),
-        "repeats": max([r.get("run",1) for r in runs]) if runs else 0,
-        "pass_rate_by_status_ok": round(len(ok)/len(runs), 3) if runs else None,
+        "repeats": max_run,
+        "pass_rate_by_status_ok": round(n_ok/n_runs, 3) if n_runs else None,
         "latency_sec": {
             "mean": round(statistics.mean(lat),3) if lat else None,
             "p50": round(percentile(lat,0.50),3) if lat else None,
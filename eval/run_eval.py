@@ -21,7 +21,10 @@ import os
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, PROJECT_ROOT)
 
-import os, json, time, argparse, pathlib, traceback
+import os, time, argparse, pathlib, traceback, asyncio
+
+# JSON/JSONL через orjson (C-парсер), если он установлен — общий с агентами модуль
+from utils.jsonutil import dumpb, dumps, loads
 
 def ensure_dir(p: str):
     pathlib.Path(p).mkdir(parents=True, exist_ok=True)
@@ -32,79 +35,210 @@ def now_ms():
 def safe_write(path, obj):
     with open(path, "w", encoding="utf-8") as f:
         if isinstance(obj, (dict, list)):
-            json.dump(obj, f, ensure_ascii=False, indent=2)
+            f.write(dumps(obj, indent=True))
         else:
             f.write(str(obj))
 
-def run_single_case(case, agents, out_dir, repeats=1):
-    """Запуск одного тест-кейса repeats раз (для устойчивости)."""
-    results=[]
-    for r in range(repeats):
-        run_id = f"{case['id']}_run{r+1}"
-        run_path = os.path.join(out_dir, run_id)
-        ensure_dir(run_path)
+async def asafe_write(path, obj):
+    """safe_write в отдельном потоке: запись артефактов не блокирует event loop"""
+    await asyncio.to_thread(safe_write, path, obj)
 
-        meta = {"id": case["id"], "category": case["category"], "run": r+1, "t_start_ms": now_ms()}
-        status = {"ok": True, "errors": []}
+class AdvicePacker:
+    """Собирает запросы к DataAnalyzerAgent в пакеты по size штук.
 
-        t0=time.time()
-        try:
-            collector, parser, validator, analyzer = agents
-
-            # 1) DataCollectorAgent: здесь проще всего НЕ имитировать диалог,
-            # а формировать user_data из prompt. Если у вас в проекте есть
-            # функция/метод, который извлекает JSON из текста — используйте её.
-            user_data = {
-                "raw_prompt": case["prompt"],
-                # минимальный набор полей, которые чаще всего нужны дальше:
-                "industry": case["category"],
-                "city": "N/A",
-                "idea": "N/A"
-            }
-            safe_write(os.path.join(run_path, "01_user_prompt.txt"), case["prompt"])
-            safe_write(os.path.join(run_path, "02_user_data.json"), user_data)
-
-            # 2) WebParserAgent: если в вашем пайплайне парсер использует urls,
-            # можно поддерживать "нулевой" режим (без url) или расширить кейсы.
-            parsed = None
-            try:
-                parsed = parser.parse_from_prompt(case["prompt"])  # если реализовано
-            except Exception:
-                # fallback: если нет такого метода — просто пропускаем и пишем заглушку
-                parsed = {"parsed_sources": [], "note": "parse_from_prompt отсутствует; подключите парсер к urls/поиску."}
-            safe_write(os.path.join(run_path, "03_parser_output.json"), parsed)
-
-            # 3) ValidatorAgent
-            validated = None
-            try:
-                validated = validator.validate_data(parsed if isinstance(parsed, dict) else {"data": parsed})
-            except Exception:
-                validated = {"is_valid": False, "issues": ["validator.validate_data failed - see logs"]}
-            safe_write(os.path.join(run_path, "04_validator_output.json"), validated)
+    Пакет уходит одним chat.completions-запросом, когда набралось size
+    запросов или прошло max_wait секунд с первого. Если ответ модели не
+    удалось разделить на части — откат на поштучные generate_advice.
+    """
+
+    def __init__(self, analyzer, size, max_wait=2.0):
+        self.analyzer = analyzer
+        self.size = size
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
 
-            # 4) DataAnalyzerAgent: основной итоговый текст/структура
-            advice = analyzer.generate_advice(user_data)
-            safe_write(os.path.join(run_path, "05_final_answer.txt"), advice)
+    async def submit(self, user_data):
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((user_data, fut))
+        if len(self._pending) >= self.size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await fut
 
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        users = [user_data for user_data, _ in batch]
+        try:
+            answers = None
+            if len(users) > 1:
+                answers = await self.analyzer.generate_advice_batch(users)
+            if answers is None:
+                answers = await asyncio.gather(*(self.analyzer.generate_advice(u) for u in users))
         except Exception as e:
-            status["ok"]=False
-            status["errors"].append({"type": type(e).__name__, "msg": str(e), "trace": traceback.format_exc()})
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        for (_, fut), advice in zip(batch, answers):
+            fut.set_result(advice)
+
+# Пайплайн прогона: 3 стадии (валидатор и аналитик — одна). Каждая стадия — пул воркеров
+# со своей очередью, поэтому стадия i для прогона k+1 идёт параллельно со
+# стадией i+1 для прогона k; пропускная способность упирается в самую медленную.
+
+def new_run(case, out_dir, r):
+    """Состояние одного прогона, которое передаётся между стадиями"""
+    run_id = f"{case['id']}_run{r+1}"
+    return {
+        "case": case,
+        "path": os.path.join(out_dir, run_id),
+        "meta": {"id": case["id"], "category": case["category"], "run": r+1},
+        "status": {"ok": True, "errors": []},
+    }
+
+async def stage_collect(run, agents, packer):
+    case = run["case"]
+    ensure_dir(run["path"])
+    run["meta"]["t_start_ms"] = now_ms()
+
+    # 1) DataCollectorAgent: здесь проще всего НЕ имитировать диалог,
+    # а формировать user_data из prompt. Если у вас в проекте есть
+    # функция/метод, который извлекает JSON из текста — используйте её.
+    run["user_data"] = {
+        "raw_prompt": case["prompt"],
+        # минимальный набор полей, которые чаще всего нужны дальше:
+        "industry": case["category"],
+        "city": "N/A",
+        "idea": "N/A"
+    }
+    await asafe_write(os.path.join(run["path"], "01_user_prompt.txt"), case["prompt"])
+    await asafe_write(os.path.join(run["path"], "02_user_data.json"), run["user_data"])
+
+async def stage_parse(run, agents, packer):
+    parser = agents[1]
+    # 2) WebParserAgent: если в вашем пайплайне парсер использует urls,
+    # можно поддерживать "нулевой" режим (без url) или расширить кейсы.
+    parsed = None
+    try:
+        parsed = await parser.parse_from_prompt(run["case"]["prompt"])  # если реализовано
+    except Exception:
+        # fallback: если нет такого метода — просто пропускаем и пишем заглушку
+        parsed = {"parsed_sources": [], "note": "parse_from_prompt отсутствует; подключите парсер к urls/поиску."}
+    run["parsed"] = parsed
+    await asafe_write(os.path.join(run["path"], "03_parser_output.json"), parsed)
+
+async def stage_validate(run, agents, packer):
+    validator = agents[2]
+    parsed = run["parsed"]
+    # 3) ValidatorAgent
+    validated = None
+    try:
+        validated = await validator.validate_data(parsed if isinstance(parsed, dict) else {"data": parsed})
+    except Exception:
+        validated = {"is_valid": False, "issues": ["validator.validate_data failed - see logs"]}
+    await asafe_write(os.path.join(run["path"], "04_validator_output.json"), validated)
+
+async def stage_analyze(run, agents, packer):
+    analyzer = agents[3]
+    # 4) DataAnalyzerAgent: основной итоговый текст/структура.
+    # Без упаковки ответ стримится прямо в файл по мере генерации: запись
+    # буферизована и идёт inline, в поток выносятся только open/close.
+    ans_path = os.path.join(run["path"], "05_final_answer.txt")
+    if packer is not None:
+        advice = await packer.submit(run["user_data"])
+        await asafe_write(ans_path, advice)
+    else:
+        f = await asyncio.to_thread(open, ans_path, "w", encoding="utf-8")
+        try:
+            await analyzer.generate_advice(run["user_data"], stream_to=f)
         finally:
-            t1=time.time()
-            meta["latency_sec"]=round(t1-t0, 3)
-            meta["status"]=status
-            safe_write(os.path.join(run_path, "meta.json"), meta)
-            results.append(meta)
-    return results
+            await asyncio.to_thread(f.close)
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--project_root", default=".", help="Корень проекта (где main.py / agents/)")
-    ap.add_argument("--cases", default="eval/testcases.jsonl", help="Путь к тест-кейсам")
-    ap.add_argument("--out", default="eval_outputs/raw", help="Папка для сырых логов")
-    ap.add_argument("--repeats", type=int, default=1, help="Повторы на кейс (для устойчивости), например 3")
-    args = ap.parse_args()
+async def stage_validate_analyze(run, agents, packer):
+    # Аналитику нужен только user_data, а не вывод валидатора — оба LLM-вызова
+    # идут одновременно, и задержка прогона равна большему из них, а не сумме
+    results = await asyncio.gather(
+        stage_validate(run, agents, packer),
+        stage_analyze(run, agents, packer),
+        return_exceptions=True,
+    )
+    for r in results:
+        if isinstance(r, BaseException):
+            raise r
+
+STAGES = (stage_collect, stage_parse, stage_validate_analyze)
+
+async def finish_run(run):
+    meta = run["meta"]
+    # Сумма времени работы стадий: ожидание в очередях между стадиями
+    # в latency не входит, как и при последовательном прогоне
+    meta["latency_sec"] = round(run["work_sec"], 3) if "work_sec" in run else None
+    meta["status"] = run["status"]
+    await asafe_write(os.path.join(run["path"], "meta.json"), meta)
+
+def record_error(run, e):
+    run["status"]["ok"]=False
+    run["status"]["errors"].append({"type": type(e).__name__, "msg": str(e), "trace": traceback.format_exc()})
+
+async def run_pipeline(runs, agents, workers, packer=None):
+    """Прогоняет runs через STAGES; workers — число воркеров на каждую стадию"""
+    queues = [asyncio.Queue() for _ in STAGES]
+
+    async def worker(i):
+        while True:
+            run = await queues[i].get()
+            try:
+                # после ошибки прогон проходит оставшиеся стадии транзитом
+                if run["status"]["ok"]:
+                    t0 = time.time()
+                    try:
+                        await STAGES[i](run, agents, packer)
+                    except Exception as e:
+                        record_error(run, e)
+                    run["work_sec"] = run.get("work_sec", 0.0) + time.time() - t0
+                if i+1 < len(STAGES):
+                    queues[i+1].put_nowait(run)
+                else:
+                    await finish_run(run)
+            except Exception as e:
+                # ошибка передачи/записи meta.json (например, OSError) не должна
+                # убивать воркер: иначе очередь не опустеет и join зависнет
+                record_error(run, e)
+                run["meta"]["status"] = run["status"]
+            finally:
+                queues[i].task_done()
+
+    async def join_all():
+        # очередь i+1 пополняется до task_done в очереди i, поэтому join по порядку достаточен
+        for q in queues:
+            await q.join()
+
+    tasks = [asyncio.create_task(worker(i)) for i in range(len(STAGES)) for _ in range(workers)]
+    for run in runs:
+        queues[0].put_nowait(run)
+    # Если воркер всё же упал, ждать опустошения очередей бессмысленно
+    joined = asyncio.create_task(join_all())
+    await asyncio.wait([joined, *tasks], return_when=asyncio.FIRST_COMPLETED)
+    for t in (joined, *tasks):
+        t.cancel()
+    results = await asyncio.gather(joined, *tasks, return_exceptions=True)
+    for r in results:
+        if isinstance(r, BaseException) and not isinstance(r, asyncio.CancelledError):
+            raise r
+    return [run["meta"] for run in runs]
 
+async def main_async(args):
     os.chdir(args.project_root)
     ensure_dir(args.out)
 
@@ -113,8 +247,15 @@ def main():
     from agents.web_parser import WebParserAgent
     from agents.validator import ValidatorAgent
     from agents.data_analyzer import DataAnalyzerAgent
+    from agents._client import get_shared_client, close_shared_client
     from database.json_db import JSONDatabase
+    from config import config
 
+    if args.force_cache:
+        config.FORCE_LLM_CACHE = True
+
+    # Общий клиент создаётся один раз до агентов и переиспользуется всеми прогонами
+    get_shared_client()
     db = JSONDatabase("data/database.json")
     collector = DataCollectorAgent()
     parser = WebParserAgent()
@@ -123,20 +264,36 @@ def main():
 
     agents = (collector, parser, validator, analyzer)
 
-    all_runs=[]
+    cases=[]
     with open(args.cases, "r", encoding="utf-8") as f:
         for line in f:
             if not line.strip(): 
                 continue
-            case=json.loads(line)
-            all_runs.extend(run_single_case(case, agents, args.out, repeats=args.repeats))
+            cases.append(loads(line))
+
+    packer = AdvicePacker(analyzer, args.pack) if args.pack > 1 else None
+    runs = [new_run(case, args.out, r) for case in cases for r in range(args.repeats)]
+    all_runs = await run_pipeline(runs, agents, args.concurrency, packer)
+    await parser.close()
+    await close_shared_client()
 
     ensure_dir("eval_outputs")
-    with open("eval_outputs/runs_index.jsonl","w",encoding="utf-8") as f:
-        for r in all_runs:
-            f.write(json.dumps(r, ensure_ascii=False)+"\n")
+    with open("eval_outputs/runs_index.jsonl","wb") as f:
+        f.write(b"".join(dumpb(r)+b"\n" for r in all_runs))
 
     print(f"Done. Runs: {len(all_runs)}. Raw logs in {args.out}. Index: eval_outputs/runs_index.jsonl")
 
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--project_root", default=".", help="Корень проекта (где main.py / agents/)")
+    ap.add_argument("--cases", default="eval/testcases.jsonl", help="Путь к тест-кейсам")
+    ap.add_argument("--out", default="eval_outputs/raw", help="Папка для сырых логов")
+    ap.add_argument("--repeats", type=int, default=1, help="Повторы на кейс (для устойчивости), например 3")
+    ap.add_argument("--force_cache", action="store_true", help="Кэшировать ответы LLM даже при temperature > 0")
+    ap.add_argument("--concurrency", type=int, default=10, help="Воркеров на каждую стадию пайплайна (ограничение RPM провайдера)")
+    ap.add_argument("--pack", type=int, default=1, help="Сколько итоговых ответов упаковывать в один запрос (1 = без упаковки)")
+    args = ap.parse_args()
+    asyncio.run(main_async(args))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Прогон eval через Batch API (OpenAI-совместимый эндпоинт /v1/batches).
+
+Eval не требует ответов в реальном времени, поэтому LLM-шаги всех кейсов
+(ValidatorAgent и DataAnalyzerAgent) отправляются одним пакетом:
+- дешевле (скидка ~50% у OpenAI) и отдельный, более высокий лимит запросов;
+- результат приходит в течение completion_window (до 24 ч).
+
+Что делает:
+- собирает промпты агентов для каждой пары (кейс, повтор) и пишет их в JSONL
+- загружает файл (purpose="batch") и создаёт batch
+- опрашивает статус с экспоненциальной задержкой
+- раскладывает ответы по custom_id в те же артефакты, что и run_eval.py
+  (01_user_prompt.txt ... 05_final_answer.txt, meta.json) и пишет runs_index.jsonl
+
+Важно:
+- OpenRouter не поддерживает Batch API, поэтому по умолчанию используется
+  api.openai.com и модель из --model. Для интерактивной отладки и --repeats 1
+  остаётся обычный run_eval.py.
+- latency_sec в meta.json = null: время пакета не отражает задержку пайплайна.
+"""
+import sys
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+import time, argparse
+
+from config import config
+from run_eval import dumpb, dumps, ensure_dir, loads, now_ms, safe_write
+
+PARSER_STUB = {"parsed_sources": [], "note": "parse_from_prompt отсутствует; подключите парсер к urls/поиску."}
+
+def build_user_data(case):
+    # Тот же минимальный user_data, что и в run_eval.py
+    return {
+        "raw_prompt": case["prompt"],
+        "industry": case["category"],
+        "city": "N/A",
+        "idea": "N/A"
+    }
+
+def request_line(custom_id, agent, prompt, model):
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": agent.build_messages(prompt),
+            "temperature": agent.TEMPERATURE,
+            "max_tokens": config.MAX_TOKENS,
+        },
+    }
+
+def wait_for_batch(client, batch_id, poll_min=10, poll_max=300):
+    """Опрос статуса batch с экспоненциальной задержкой"""
+    delay = poll_min
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        print(f"[{time.strftime('%H:%M:%S')}] batch {batch_id}: {batch.status}")
+        if batch.status in ("completed", "failed", "expired", "cancelled"):
+            return batch
+        time.sleep(delay)
+        delay = min(delay * 2, poll_max)
+
+def read_results(client, file_id):
+    """custom_id -> текст ответа или исключение-описание ошибки"""
+    results = {}
+    if not file_id:
+        return results
+    content = client.files.content(file_id).text
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        item = loads(line)
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code") != 200:
+            results[item["custom_id"]] = RuntimeError(dumps(item.get("error") or response))
+        else:
+            results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return results
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--project_root", default=".", help="Корень проекта (где main.py / agents/)")
+    ap.add_argument("--cases", default="eval/testcases.jsonl", help="Путь к тест-кейсам")
+    ap.add_argument("--out", default="eval_outputs/raw", help="Папка для сырых логов")
+    ap.add_argument("--repeats", type=int, default=1, help="Повторы на кейс (для устойчивости), например 3")
+    ap.add_argument("--model", default=os.getenv("BATCH_MODEL", "gpt-4o-mini"), help="Модель у провайдера Batch API")
+    ap.add_argument("--base_url", default=os.getenv("BATCH_BASE_URL", "https://api.openai.com/v1"))
+    ap.add_argument("--api_key_env", default="OPENAI_API_KEY", help="Переменная окружения с ключом")
+    args = ap.parse_args()
+
+    os.chdir(args.project_root)
+    ensure_dir(args.out)
+
+    from openai import OpenAI
+    from agents.validator import ValidatorAgent
+    from agents.data_analyzer import DataAnalyzerAgent
+    from database.json_db import JSONDatabase
+
+    client = OpenAI(api_key=os.getenv(args.api_key_env), base_url=args.base_url)
+    db = JSONDatabase("data/database.json")
+    validator = ValidatorAgent()
+    analyzer = DataAnalyzerAgent(db)
+
+    cases=[]
+    with open(args.cases, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                cases.append(loads(line))
+
+    # 1) Формируем запросы и пишем промежуточные артефакты
+    batch_path = os.path.join("eval_outputs", "batch_requests.jsonl")
+    ensure_dir("eval_outputs")
+    runs = []
+    with open(batch_path, "wb") as f:
+        for case in cases:
+            user_data = build_user_data(case)
+            for r in range(args.repeats):
+                run_id = f"{case['id']}_run{r+1}"
+                run_path = os.path.join(args.out, run_id)
+                ensure_dir(run_path)
+                safe_write(os.path.join(run_path, "01_user_prompt.txt"), case["prompt"])
+                safe_write(os.path.join(run_path, "02_user_data.json"), user_data)
+                safe_write(os.path.join(run_path, "03_parser_output.json"), PARSER_STUB)
+
+                lines = [
+                    request_line(f"{run_id}:validator", validator, validator.build_prompt(PARSER_STUB), args.model),
+                    request_line(f"{run_id}:analyzer", analyzer, analyzer.build_prompt(user_data), args.model),
+                ]
+                for item in lines:
+                    f.write(dumpb(item)+b"\n")
+                runs.append((case, r, run_id, run_path))
+
+    # 2) Загружаем и запускаем batch
+    t_start_ms = now_ms()
+    with open(batch_path, "rb") as f:
+        batch_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    print(f"Batch {batch.id} создан: {len(runs)*2} запросов")
+    batch = wait_for_batch(client, batch.id)
+
+    # 3) Раскладываем ответы по прогонам
+    results = read_results(client, batch.output_file_id)
+    results.update(read_results(client, getattr(batch, "error_file_id", None)))
+
+    all_runs=[]
+    for case, r, run_id, run_path in runs:
+        meta = {"id": case["id"], "category": case["category"], "run": r+1, "t_start_ms": t_start_ms,
+                "batch_id": batch.id, "latency_sec": None}
+        status = {"ok": True, "errors": []}
+
+        validated = results.get(f"{run_id}:validator")
+        if isinstance(validated, str):
+            validated = validator.extract_json(validated)
+        else:
+            validated = {"is_valid": False, "issues": [f"validator batch request failed: {validated}"]}
+        safe_write(os.path.join(run_path, "04_validator_output.json"), validated)
+
+        advice = results.get(f"{run_id}:analyzer")
+        if isinstance(advice, str):
+            safe_write(os.path.join(run_path, "05_final_answer.txt"), advice)
+        else:
+            status["ok"] = False
+            status["errors"].append({"type": "BatchError", "msg": str(advice or f"batch {batch.status}: нет ответа")})
+
+        meta["status"]=status
+        safe_write(os.path.join(run_path, "meta.json"), meta)
+        all_runs.append(meta)
+
+    with open("eval_outputs/runs_index.jsonl","wb") as f:
+        f.write(b"".join(dumpb(r)+b"\n" for r in all_runs))
+
+    print(f"Done. Batch: {batch.id} ({batch.status}). Runs: {len(all_runs)}. Raw logs in {args.out}. Index: eval_outputs/runs_index.jsonl")
+
+if __name__ == "__main__":
+    main()
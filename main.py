@@ -3,9 +3,10 @@ from agents.data_analyzer import DataAnalyzerAgent
 from agents.web_parser import WebParserAgent
 from agents.validator import ValidatorAgent
 from database.json_db import JSONDatabase
+import asyncio
 import json
 
-def main():
+async def main():
     # Инициализация компонентов
     db = JSONDatabase("data/database.json")
     collector = DataCollectorAgent()
@@ -24,7 +25,7 @@ def main():
         if user_input.lower() in ['выход', 'exit', 'quit']:
             break
             
-        next_question, collected_data = collector.process_user_input(user_input)
+        next_question, collected_data = await collector.process_user_input(user_input)
         
         if collected_data:
             user_data = collected_data
@@ -35,7 +36,7 @@ def main():
     
     if user_data:
         # Генерируем советы
-        advice = analyzer.generate_advice(user_data)
+        advice = await analyzer.generate_advice(user_data)
         print(f"\n🎯 РЕКОМЕНДАЦИИ ДЛЯ ВАШЕГО БИЗНЕСА:\n")
         print(advice)
         
@@ -46,7 +47,17 @@ def main():
             "response_preview": advice[:200] + "..."
         })
 
-def developer_mode():
+async def validate_parsed(validator: ValidatorAgent, data: dict) -> dict:
+    """Валидация результата парсинга страницы.
+
+    Если трендов нет (ошибка загрузки/парсинга или пустой ответ), сохранять
+    всё равно нечего — вызов LLM-валидатора пропускаем.
+    """
+    if not data.get('trends'):
+        return {"is_valid": False, "issues": [data.get('error', 'Тренды не найдены')]}
+    return await validator.validate_data(data)
+
+async def developer_mode():
     """Режим для разработчиков - парсинг сайтов"""
     db = JSONDatabase("data/database.json")
     parser = WebParserAgent()
@@ -57,34 +68,47 @@ def developer_mode():
         # Добавьте свои URL здесь
     ]
     
-    for url in urls:
-        print(f"Парсинг {url}...")
-        data = parser.parse_website(url)
-        
-        # Валидируем данные
-        validation = validator.validate_data(data)
-        
+    # Повторы и страницы, тренды которых уже в БД, не загружаем повторно
+    urls = [url for url in dict.fromkeys(urls) if not db.has_source(url)]
+    if not urls:
+        print("Все страницы уже обработаны")
+        return
+    
+    # Страницы и их валидация независимы — запускаем всё конкурентно
+    print(f"Парсинг {len(urls)} страниц...")
+    parsed = await parser.parse_websites(urls)
+    await parser.close()
+    validations = await asyncio.gather(*(validate_parsed(validator, data) for data in parsed))
+    
+    # Тренды всех страниц копим и сохраняем в БД одной записью
+    new_trends = []
+    for url, data, validation in zip(urls, parsed, validations):
+        print(f"Результат {url}:")
         if validation.get('is_valid', False):
-            # Сохраняем в БД
             for trend in data.get('trends', []):
-                db.add_business_trend({
+                new_trends.append({
                     "industry": data.get('industry', 'IT'),
                     "trend": trend,
                     "description": f"Извлечено с {url}",
                     "sources": [url],
                     "confidence": validation.get('confidence_score', 0.5)
                 })
-            print("✓ Данные сохранены")
+            print("✓ Данные приняты")
         else:
             print("✗ Данные не прошли валидацию:", validation.get('issues', []), validation.get('confidence_score'))
+    
+    # Тренды, которые уже есть в БД (та же отрасль и формулировка), не дублируем
+    unique = [trend for trend in new_trends if not db.has_trend(trend)]
+    db.add_business_trends(unique)
+    print(f"✓ Сохранено трендов: {len(unique)} (дубликатов пропущено: {len(new_trends) - len(unique)})")
 
 if __name__ == "__main__":
     # Режим пользователя
-    main()
+    asyncio.run(main())
     
     # Или режим разработчика (раскомментируйте)
-    #developer_mode()
+    #asyncio.run(developer_mode())
     # url ="https://habr.com/ru/companies/domclick/articles/928600/"
     # parser = WebParserAgent()
 
-    # print(parser.parse_website(url))
\ No newline at end of file
+    # print(asyncio.run(parser.parse_website(url)))
\ No newline at end of file
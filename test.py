@@ -1,12 +1,13 @@
 # test_deepseek.py
 from agents.base_agent import BaseAgent
+import asyncio
 import config
 
-def test_deepseek():
+async def test_deepseek():
     agent = BaseAgent("test", "Ты полезный ассистент")
-    response = agent.call_llm("Привет! Ответь коротко: как дела?")
+    response = await agent.call_llm("Привет! Ответь коротко: как дела?")
     print("DeepSeek ответ:", response)
 
 if __name__ == "__main__":
-    test_deepseek()
+    asyncio.run(test_deepseek())
 
@@ -0,0 +1,50 @@
+import asyncio
+
+import agents.cache as cache_module
+from agents.cache import ToolCache, make_key
+
+
+def make_cache(tmp_path, maxsize=512):
+    return ToolCache(str(tmp_path / "cache" / "tools.sqlite"), maxsize=maxsize)
+
+
+def test_ttl_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = make_cache(tmp_path)
+    key = make_key("fetch_page_text", {"url": "https://example.com"})
+    cache.put(key, "текст", ttl=60)
+    cache.put(b"forever", "без срока")
+
+    now[0] += 59
+    assert cache.get(key) == "текст"
+    assert make_cache(tmp_path).get(key) == "текст"  # с диска
+
+    now[0] += 2
+    assert cache.get(key) is None
+    assert make_cache(tmp_path).get(key) is None  # просроченная запись удалена и из SQLite
+    assert cache.get(b"forever") == "без срока"
+
+
+def test_lru_eviction(tmp_path):
+    cache = make_cache(tmp_path, maxsize=2)
+    cache.put(b"a", 1)
+    cache.put(b"b", 2)
+    assert cache.get(b"a") == 1  # a становится самым свежим
+    cache.put(b"c", 3)
+    assert list(cache._memory) == [b"a", b"c"]
+    # вытесненное из памяти остаётся на диске и возвращается в LRU при чтении
+    assert cache.get(b"b") == 2
+    assert list(cache._memory) == [b"c", b"b"]
+
+
+def test_async_get_put(tmp_path):
+    cache = make_cache(tmp_path)
+
+    async def scenario():
+        assert await cache.aget(b"k") is None
+        await cache.aput(b"k", "", ttl=60)  # пустой текст — тоже значение
+        assert await cache.aget(b"k") == ""
+        assert await make_cache(tmp_path).aget(b"k") == ""
+
+    asyncio.run(scenario())
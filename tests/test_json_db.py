@@ -0,0 +1,56 @@
+from database.json_db import JSONDatabase
+
+
+def make_db(tmp_path):
+    return JSONDatabase(str(tmp_path / "db.json"))
+
+
+def test_add_business_trends_keeps_all_and_tracks_keys(tmp_path):
+    db = make_db(tmp_path)
+    assert not db.has_trend({"industry": "IT", "trend": "Low-code"})
+    db.add_business_trends([
+        {"industry": "IT", "trend": "ИИ-ассистенты"},
+        {"industry": "IT", "trend": "Low-code"},
+        {"industry": "IT", "trend": "Low-code"},
+    ])
+    assert len(make_db(tmp_path).search_trends("IT")) == 3
+    assert db.has_trend({"industry": "it", "trend": " low-code "})
+    assert make_db(tmp_path).has_trend({"industry": "IT", "trend": "ии-ассистенты"})
+
+
+def test_add_business_trends_accepts_non_string_fields(tmp_path):
+    # LLM иногда возвращает тренд объектом и industry: null
+    db = make_db(tmp_path)
+    trends = [
+        {"industry": None, "trend": "Доставка"},
+        {"industry": "Retail", "trend": {"name": "Маркетплейсы", "growth": 0.3}},
+        {"industry": "Retail", "trend": None, "sources": None},
+    ]
+    db.add_business_trends(trends)
+    assert db.has_trend({"industry": None, "trend": "доставка"})
+    assert db.has_trend({"industry": "retail", "trend": {"growth": 0.3, "name": "Маркетплейсы"}})
+    assert len(make_db(tmp_path).search_trends("retail")) == 2
+    assert db.search_trends("") == make_db(tmp_path).search_trends("")
+
+
+def test_has_source(tmp_path):
+    db = make_db(tmp_path)
+    assert not db.has_source("https://example.com/a")
+    db.add_business_trends([{"industry": "IT", "trend": "A", "sources": ["https://example.com/a"]}])
+    assert db.has_source("https://example.com/a")
+    assert make_db(tmp_path).has_source("https://example.com/a")
+
+
+def test_search_trends_returns_copies(tmp_path):
+    db = make_db(tmp_path)
+    db.add_business_trends([{"industry": "IT", "trend": "A", "sources": ["https://example.com/a"]}])
+    for _ in range(2):  # первый вызов и попадание в кэш результатов
+        found = db.search_trends("IT")[0]
+        found["trend"] = "изменено"
+        found["sources"].append("https://example.com/b")
+    trend = db.search_trends("IT")[0]
+    assert trend["trend"] == "A"
+    assert trend["sources"] == ["https://example.com/a"]
+    assert db.has_trend({"industry": "IT", "trend": "A"})
+    db.add_parsed_source({"url": "https://example.com/c"})  # перезапись файла из памяти
+    assert make_db(tmp_path).search_trends("IT")[0]["sources"] == ["https://example.com/a"]
@@ -0,0 +1,66 @@
+import asyncio
+
+import utils.ratelimit as ratelimit
+from utils.ratelimit import AsyncLimiter
+
+
+class FakeClock:
+    """Подменяет time.monotonic и asyncio.sleep: сон сдвигает часы мгновенно"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+def make_limiter(monkeypatch, rpm, tpm):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(ratelimit.asyncio, "sleep", clock.sleep)
+    return AsyncLimiter(rpm, tpm), clock
+
+
+def test_rpm_throttling(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch, rpm=60, tpm=10_000)
+
+    async def scenario():
+        for _ in range(60):
+            await limiter.acquire(req=1)
+        assert clock.sleeps == []
+        # Бакет пуст: следующий запрос ждёт восстановления 1 запроса (60/60 в секунду)
+        await limiter.acquire(req=1)
+
+    asyncio.run(scenario())
+    assert sum(clock.sleeps) == 1.0
+
+
+def test_tpm_throttling(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch, rpm=1000, tpm=600)
+
+    async def scenario():
+        await limiter.acquire(req=1, tok=500)
+        assert clock.sleeps == []
+        # Не хватает 400 токенов при 10 токенах в секунду
+        await limiter.acquire(req=1, tok=500)
+
+    asyncio.run(scenario())
+    assert sum(clock.sleeps) == 40.0
+
+
+def test_refill_is_capped_and_oversized_request_passes(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch, rpm=60, tpm=600)
+
+    async def scenario():
+        clock.now += 3600  # простой не накапливает ёмкость сверх бакета
+        await limiter.acquire(req=1, tok=10_000)  # больше TPM: урезается до размера бакета
+        assert limiter.available_tok_capacity == 0
+        assert limiter.available_req_capacity == 59
+
+    asyncio.run(scenario())
+    assert clock.sleeps == []
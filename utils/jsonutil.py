@@ -0,0 +1,34 @@
+import json
+
+# orjson (Rust) в разы быстрее stdlib json и сразу пишет UTF-8 без \uXXXX;
+# без него — прежнее поведение через json с ensure_ascii=False
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj, indent: bool = False, sort_keys: bool = False) -> str:
+    """JSON-строка без экранирования кириллицы (indent — отступ в 2 пробела)"""
+    if orjson is not None:
+        option = 0
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, sort_keys=sort_keys)
+
+
+def dumpb(obj) -> bytes:
+    """Компактный JSON сразу в UTF-8 байтах — для записи в файлы, открытые в "wb" """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def loads(data):
+    """Разбор JSON из str или bytes; ошибки — ValueError, как у json.loads"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
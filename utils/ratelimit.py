@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from config import config
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа токенов в тексте.
+
+    Для моделей OpenRouter точного токенизатора нет, поэтому используется
+    cl100k_base (если установлен tiktoken) либо грубая оценка по длине:
+    для кириллицы ~2 символа на токен, оценка получается с запасом.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 2 + 1
+
+
+class AsyncLimiter:
+    """Token bucket по запросам (RPM) и токенам (TPM).
+
+    Перед каждым вызовом LLM резервируется 1 запрос и оценка токенов
+    (промпт + max_tokens). Ёмкость восстанавливается непрерывно со скоростью
+    RPM/60 и TPM/60 в секунду — пересчёт делается при каждом acquire, отдельная
+    фоновая задача не нужна.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.available_req_capacity = float(rpm)
+        self.available_tok_capacity = float(tpm)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self.available_req_capacity = min(self.rpm, self.available_req_capacity + elapsed * self.rpm / 60)
+        self.available_tok_capacity = min(self.tpm, self.available_tok_capacity + elapsed * self.tpm / 60)
+
+    async def acquire(self, req: int = 1, tok: int = 0):
+        # Запрос больше всего бакета иначе ждал бы вечно
+        tok = min(tok, self.tpm)
+        # Lock держится и на время ожидания: запросы обслуживаются по очереди
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.available_req_capacity >= req and self.available_tok_capacity >= tok:
+                    self.available_req_capacity -= req
+                    self.available_tok_capacity -= tok
+                    return
+                wait = max(
+                    (req - self.available_req_capacity) * 60 / self.rpm,
+                    (tok - self.available_tok_capacity) * 60 / self.tpm,
+                )
+                await asyncio.sleep(max(wait, 0.01))
+
+
+_limiter = None
+
+def get_limiter() -> AsyncLimiter:
+    """Общий для всех агентов лимитер запросов к OpenRouter"""
+    global _limiter
+    if _limiter is None:
+        _limiter = AsyncLimiter(config.RATE_LIMIT_RPM, config.RATE_LIMIT_TPM)
+    return _limiter